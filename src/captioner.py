@@ -1,53 +1,246 @@
 import torch
 from transformers import BlipProcessor, BlipForConditionalGeneration
 from PIL import Image
+import copy
+import hashlib
+import importlib.util
+import io
+import multiprocessing
 import os
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Common objects and activities that might appear in images
+_TAG_KEYWORDS = {
+    # People and actions
+    'people': ('person', 'people', 'man', 'woman', 'child', 'boy', 'girl', 'baby', 'adult'),
+    'actions': ('running', 'walking', 'sitting', 'standing', 'jumping', 'dancing', 'playing', 'working', 'exercising', 'cooking', 'reading', 'writing', 'driving', 'riding', 'swimming', 'flying', 'climbing', 'lifting', 'pushing', 'pulling', 'throwing', 'catching', 'kicking', 'hitting'),
+    'sports': ('football', 'basketball', 'tennis', 'soccer', 'baseball', 'golf', 'hockey', 'volleyball', 'boxing', 'wrestling', 'cycling', 'skiing', 'surfing', 'skateboarding', 'yoga', 'gym', 'fitness', 'workout', 'exercise', 'bench press', 'squats', 'deadlift'),
+    'locations': ('park', 'beach', 'street', 'road', 'building', 'house', 'office', 'school', 'hospital', 'restaurant', 'store', 'mall', 'gym', 'stadium', 'field', 'court', 'track', 'pool', 'lake', 'river', 'mountain', 'forest', 'desert', 'city', 'town', 'village'),
+    'objects': ('car', 'truck', 'bike', 'bicycle', 'motorcycle', 'bus', 'train', 'plane', 'boat', 'chair', 'table', 'bed', 'computer', 'phone', 'camera', 'book', 'ball', 'bottle', 'cup', 'plate', 'food', 'tree', 'flower', 'animal', 'dog', 'cat', 'bird'),
+    'weather': ('sunny', 'cloudy', 'rainy', 'snowy', 'foggy', 'windy', 'storm', 'clear', 'bright', 'dark', 'day', 'night', 'morning', 'afternoon', 'evening', 'sunset', 'sunrise'),
+    'colors': ('red', 'blue', 'green', 'yellow', 'orange', 'purple', 'pink', 'black', 'white', 'gray', 'grey', 'brown', 'silver', 'gold'),
+    'emotions': ('happy', 'sad', 'angry', 'excited', 'surprised', 'calm', 'peaceful', 'energetic', 'tired', 'focused', 'concentrated', 'relaxed')
+}
+
+# Scene context rules in priority order: the first matching value wins for each field
+_SCENE_RULES = (
+    # Whole-word matching: plural and compound forms need their own entries
+    ("setting", "indoor", ('indoor', 'indoors', 'inside', 'room', 'rooms', 'bedroom', 'bathroom', 'classroom',
+                           'living room', 'office', 'offices', 'house', 'houses', 'building', 'buildings')),
+    ("setting", "outdoor", ('outdoor', 'outdoors', 'outside', 'park', 'parks', 'street', 'streets', 'beach',
+                            'beaches', 'field', 'fields', 'forest', 'forests')),
+    ("time_of_day", "night", ('night', 'evening', 'dark')),
+    ("time_of_day", "morning", ('morning', 'sunrise')),
+    ("time_of_day", "day", ('afternoon', 'day', 'sunny', 'bright')),
+    ("time_of_day", "evening", ('sunset', 'dusk')),
+    ("activity_level", "high", ('running', 'jumping', 'dancing', 'playing', 'exercising', 'working out')),
+    ("activity_level", "medium", ('walking', 'standing', 'working')),
+    ("activity_level", "low", ('sitting', 'lying', 'sleeping', 'resting')),
+    ("social_context", "group", ('group', 'people', 'crowd', 'team', 'family')),
+    ("social_context", "individual", ('person', 'man', 'woman', 'individual')),
+    ("mood", "positive", ('smiling', 'happy', 'celebrating', 'laughing')),
+    ("mood", "focused", ('focused', 'concentrated', 'serious', 'determined')),
+    ("mood", "calm", ('relaxed', 'calm', 'peaceful')),
+)
+
+def _build_keyword_index() -> dict:
+    """Map every keyword (single word or phrase) to the labels it triggers."""
+    index = {}
+    for category, keywords in _TAG_KEYWORDS.items():
+        for keyword in keywords:
+            index.setdefault(keyword, set()).add(("tag", category))
+    for field, value, keywords in _SCENE_RULES:
+        for keyword in keywords:
+            index.setdefault(keyword, set()).add((field, value))
+    return {keyword: frozenset(labels) for keyword, labels in index.items()}
+
+# One lookup table for all vocabularies, so a caption is scanned once for every category
+_WORD_PATTERN = re.compile(r"[a-z]+")
+_KEYWORD_INDEX = _build_keyword_index()
+_MAX_KEYWORD_WORDS = max(len(keyword.split()) for keyword in _KEYWORD_INDEX)
+
+def _scan_keywords(caption_lower: str) -> list:
+    """Return the keywords found in a lowercased caption, in order of appearance."""
+    words = _WORD_PATTERN.findall(caption_lower)
+    found = []
+    for start in range(len(words)):
+        # Phrases may not run past the last word, or the final keyword would repeat
+        for length in range(1, min(_MAX_KEYWORD_WORDS, len(words) - start) + 1):
+            phrase = " ".join(words[start:start + length])
+            if phrase in _KEYWORD_INDEX:
+                found.append(phrase)
+    return found
+
+class _VisionEncoder(torch.nn.Module):
+    """Tensor-only view of BLIP's vision tower so it can be traced."""
+    
+    def __init__(self, vision_model):
+        super().__init__()
+        self.vision_model = vision_model
+    
+    def forward(self, pixel_values):
+        return self.vision_model(pixel_values=pixel_values, return_dict=False)[0]
+
+class _TracedVisionModel(torch.nn.Module):
+    """Drop-in replacement for BLIP's vision tower backed by a frozen TorchScript trace."""
+    
+    def __init__(self, vision_model, example_pixels):
+        super().__init__()
+        self.config = vision_model.config
+        traced = torch.jit.trace(_VisionEncoder(vision_model).eval(), example_pixels)
+        self.encoder = torch.jit.freeze(traced)
+    
+    def forward(self, pixel_values, **kwargs):
+        # generate() only reads the last hidden state (index 0)
+        return (self.encoder(pixel_values),)
+
 class AdvancedImageCaptioner:
     """Advanced image captioning class with comprehensive analysis for AI chatbots."""
     
-    def __init__(self, model_name="Salesforce/blip-image-captioning-base"):
-        """Initialize the captioner with a pre-trained BLIP model."""
+    def __init__(self, model_name="Salesforce/blip-image-captioning-base", compile_model=True, jit_vision=False,
+                 num_beams=1, max_length=30, warmup=True, load_in_8bit=False, cache_size=1024):
+        """Initialize the captioner with a pre-trained BLIP model.
+        
+        ``num_beams`` and ``max_length`` control the standard caption; greedy
+        decoding of up to 30 tokens covers typical BLIP captions at a fraction
+        of the cost of wide beam search. ``warmup`` runs throwaway generate
+        calls on GPU so kernel selection, compilation and CUDA graph capture
+        happen on dummy inputs, once for each batch size a run is about to use
+        (including a final partial batch). ``load_in_8bit`` quantizes the text
+        decoder's linear layers to INT8 (bitsandbytes on GPU, dynamic
+        quantization on CPU). Up to ``cache_size`` results are kept keyed by
+        file content, so unchanged images are not decoded or captioned again.
+        The cache lives in memory on this instance only: it helps long-lived
+        callers and duplicate files within a run, but nothing persists across
+        processes or runs. ``cache_size=0`` disables it, including the hashing.
+        """
+        # Constructor arguments, so get_captioner can detect conflicting requests
+        self.settings = {
+            "model_name": model_name,
+            "compile_model": compile_model,
+            "jit_vision": jit_vision,
+            "num_beams": num_beams,
+            "max_length": max_length,
+            "warmup": warmup,
+            "load_in_8bit": load_in_8bit,
+            "cache_size": cache_size
+        }
+        
         print("Loading BLIP model...")
         self.processor = BlipProcessor.from_pretrained(model_name)
-        self.model = BlipForConditionalGeneration.from_pretrained(model_name)
+        self.num_beams = num_beams
+        self.max_length = max_length
         
-        # Use GPU if available
+        # Use GPU if available; half precision there halves memory traffic and enables tensor cores
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model.to(self.device)
-        print(f"Model loaded on {self.device}")
+        self.dtype = torch.float16 if self.device == "cuda" else torch.float32
+        
+        # 8-bit loading needs bitsandbytes for the kernels and accelerate for device_map
+        missing_8bit_deps = [name for name in ("bitsandbytes", "accelerate") if importlib.util.find_spec(name) is None]
+        if load_in_8bit and self.device == "cuda" and not missing_8bit_deps:
+            from transformers import BitsAndBytesConfig
+            # INT8 text decoder; the vision encoder and the (tied) LM head stay in FP16.
+            # This list replaces transformers' default skips, so the LM head is named explicitly.
+            quantization_config = BitsAndBytesConfig(
+                load_in_8bit=True, llm_int8_skip_modules=["vision_model", "text_decoder.cls.predictions.decoder"]
+            )
+            self.model = BlipForConditionalGeneration.from_pretrained(
+                model_name, quantization_config=quantization_config, torch_dtype=self.dtype, device_map={"": 0}
+            )
+        else:
+            if load_in_8bit and self.device == "cuda":
+                print(f"{' and '.join(missing_8bit_deps)} not installed, loading the model in FP16 instead of INT8")
+            self.model = BlipForConditionalGeneration.from_pretrained(model_name)
+            self.model.to(self.device)
+            if self.device == "cuda":
+                self.model = self.model.half()
+            elif load_in_8bit:
+                # Dynamic INT8 quantization of the decoder's transformer layers for CPU inference;
+                # the LM head shares its weights with the embeddings and stays in FP32
+                self.model.text_decoder.bert = torch.quantization.quantize_dynamic(
+                    self.model.text_decoder.bert, {torch.nn.Linear}, dtype=torch.qint8
+                )
+        self.model.eval()
+        
+        # Serializes model calls and warmup bookkeeping when threads share this instance;
+        # compiled CUDA graphs replay into static output buffers
+        self._model_lock = threading.Lock()
+        # Side stream for host-to-device copies, overlapping uploads with generate
+        self._copy_stream = torch.cuda.Stream() if self.device == "cuda" else None
+        
+        # LRU cache of results keyed by (content hash, generate_detailed); read from worker threads
+        self.cache_size = cache_size
+        self._result_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Speed up the vision encoder (fixed image size). generate() calls the submodules
+        # directly, so the encoder is replaced in place rather than wrapping the whole model.
+        if jit_vision:
+            # A frozen TorchScript trace runs the encoder without Python overhead
+            image_size = self.model.config.vision_config.image_size
+            example_pixels = torch.randn(1, 3, image_size, image_size, device=self.device, dtype=self.dtype)
+            with torch.no_grad():
+                self.model.vision_model = _TracedVisionModel(self.model.vision_model, example_pixels)
+        elif compile_model and self.device == "cuda" and hasattr(torch, "compile"):
+            # Fused kernels and CUDA graph replay
+            self.model.vision_model = torch.compile(
+                self.model.vision_model, mode="reduce-overhead", fullgraph=False, dynamic=True
+            )
+        
+        # Batch sizes already primed; compiled graphs and CUDA graphs are recorded per size
+        self._warmed_batch_sizes = set()
+        if self.device == "cuda":
+            # Let cuDNN pick the fastest kernels for our fixed input shapes
+            torch.backends.cudnn.benchmark = True
+        print(f"Model loaded on {self.device} ({self.dtype})")
+    
+    @torch.inference_mode()
+    def _warmup(self, batch_sizes):
+        """Run dummy generate calls to prime CUDA kernels and any compiled encoder.
+        
+        torch.compile specializes size-1 batches and reduce-overhead records a
+        CUDA graph per shape, so each batch size that will be used is primed.
+        """
+        image_size = self.model.config.vision_config.image_size
+        with self._model_lock:
+            for batch_size in sorted(set(batch_sizes) - self._warmed_batch_sizes):
+                pixel_values = torch.zeros(batch_size, 3, image_size, image_size, device=self.device, dtype=self.dtype)
+                self.model.generate(pixel_values=pixel_values, max_length=10, num_beams=self.num_beams)
+                self._warmed_batch_sizes.add(batch_size)
+    
+    def _analyze(self, caption: str) -> dict:
+        """Run all caption analysis from a single keyword scan of the caption."""
+        keywords = _scan_keywords(caption.lower())
+        tags = self._extract_tags(keywords)
+        context = self._scene_context(keywords)
+        return {
+            "keywords": keywords,
+            "tags": tags,
+            "context": context,
+            "topics": self.generate_related_topics(tags, context)
+        }
     
     def extract_tags_from_caption(self, caption: str) -> list:
         """Extract relevant tags from the caption for better AI understanding."""
-        # Common objects and activities that might appear in images
-        tag_patterns = {
-            # People and actions
-            'people': r'\b(?:person|people|man|woman|child|boy|girl|baby|adult)\b',
-            'actions': r'\b(?:running|walking|sitting|standing|jumping|dancing|playing|working|exercising|cooking|reading|writing|driving|riding|swimming|flying|climbing|lifting|pushing|pulling|throwing|catching|kicking|hitting)\b',
-            'sports': r'\b(?:football|basketball|tennis|soccer|baseball|golf|hockey|volleyball|boxing|wrestling|cycling|skiing|surfing|skateboarding|yoga|gym|fitness|workout|exercise|bench press|squats|deadlift)\b',
-            'locations': r'\b(?:park|beach|street|road|building|house|office|school|hospital|restaurant|store|mall|gym|stadium|field|court|track|pool|lake|river|mountain|forest|desert|city|town|village)\b',
-            'objects': r'\b(?:car|truck|bike|bicycle|motorcycle|bus|train|plane|boat|chair|table|bed|computer|phone|camera|book|ball|bottle|cup|plate|food|tree|flower|animal|dog|cat|bird)\b',
-            'weather': r'\b(?:sunny|cloudy|rainy|snowy|foggy|windy|storm|clear|bright|dark|day|night|morning|afternoon|evening|sunset|sunrise)\b',
-            'colors': r'\b(?:red|blue|green|yellow|orange|purple|pink|black|white|gray|grey|brown|silver|gold)\b',
-            'emotions': r'\b(?:happy|sad|angry|excited|surprised|calm|peaceful|energetic|tired|focused|concentrated|relaxed)\b'
-        }
-        
-        tags = []
-        caption_lower = caption.lower()
-        
-        for category, pattern in tag_patterns.items():
-            matches = re.findall(pattern, caption_lower)
-            tags.extend(matches)
+        return self._extract_tags(_scan_keywords(caption.lower()))
+    
+    def _extract_tags(self, keywords: list) -> list:
+        """Select the tag keywords from a caption's scanned keywords."""
+        tags = [keyword for keyword in keywords if any(label[0] == "tag" for label in _KEYWORD_INDEX[keyword])]
         
-        # Remove duplicates and return unique tags
-        return list(set(tags))
+        # Remove duplicates and return unique tags (in order of appearance)
+        return list(dict.fromkeys(tags))
     
     def analyze_scene_context(self, caption: str) -> dict:
         """Analyze the scene context for better AI understanding."""
-        caption_lower = caption.lower()
-        
+        return self._scene_context(_scan_keywords(caption.lower()))
+    
+    def _scene_context(self, keywords: list) -> dict:
+        """Analyze scene context from a caption's scanned keywords."""
         context = {
             "setting": "unknown",
             "time_of_day": "unknown",
@@ -56,127 +249,301 @@ class AdvancedImageCaptioner:
             "mood": "neutral"
         }
         
-        # Determine setting
-        if any(word in caption_lower for word in ['indoor', 'inside', 'room', 'office', 'house', 'building']):
-            context["setting"] = "indoor"
-        elif any(word in caption_lower for word in ['outdoor', 'outside', 'park', 'street', 'beach', 'field', 'forest']):
-            context["setting"] = "outdoor"
-        
-        # Determine time of day
-        if any(word in caption_lower for word in ['night', 'evening', 'dark']):
-            context["time_of_day"] = "night"
-        elif any(word in caption_lower for word in ['morning', 'sunrise']):
-            context["time_of_day"] = "morning"
-        elif any(word in caption_lower for word in ['afternoon', 'day', 'sunny', 'bright']):
-            context["time_of_day"] = "day"
-        elif any(word in caption_lower for word in ['sunset', 'dusk']):
-            context["time_of_day"] = "evening"
-        
-        # Determine activity level
-        if any(word in caption_lower for word in ['running', 'jumping', 'dancing', 'playing', 'exercising', 'working out']):
-            context["activity_level"] = "high"
-        elif any(word in caption_lower for word in ['walking', 'standing', 'working']):
-            context["activity_level"] = "medium"
-        elif any(word in caption_lower for word in ['sitting', 'lying', 'sleeping', 'resting']):
-            context["activity_level"] = "low"
-        
-        # Determine social context
-        if any(word in caption_lower for word in ['group', 'people', 'crowd', 'team', 'family']):
-            context["social_context"] = "group"
-        elif any(word in caption_lower for word in ['person', 'man', 'woman', 'individual']):
-            context["social_context"] = "individual"
-        
-        # Determine mood
-        if any(word in caption_lower for word in ['smiling', 'happy', 'celebrating', 'laughing']):
-            context["mood"] = "positive"
-        elif any(word in caption_lower for word in ['focused', 'concentrated', 'serious', 'determined']):
-            context["mood"] = "focused"
-        elif any(word in caption_lower for word in ['relaxed', 'calm', 'peaceful']):
-            context["mood"] = "calm"
+        # Every label triggered by the caption, then the rules apply in priority order
+        hits = set().union(*(_KEYWORD_INDEX[keyword] for keyword in keywords))
+        decided = set()
+        for field, value, _ in _SCENE_RULES:
+            if field not in decided and (field, value) in hits:
+                context[field] = value
+                decided.add(field)
         
         return context
     
-    def generate_ai_optimized_description(self, image_path: str) -> dict:
+    @torch.inference_mode()
+    def generate_ai_optimized_description(self, image_path: str, generate_detailed: bool = False) -> dict:
         """Generate comprehensive image analysis optimized for AI chatbot prompts."""
-        try:
-            # Load and process the image
-            image = Image.open(image_path).convert('RGB')
-            
-            # Get image dimensions for context
-            width, height = image.size
-            
-            # Process the image
-            inputs = self.processor(image, return_tensors="pt").to(self.device)
-            
-            # Generate multiple captions with different parameters for variety
-            captions = []
+        return self.generate_batch([image_path], gpu_batch_size=1, generate_detailed=generate_detailed)[0]
+    
+    def generate_batch(self, image_paths: list, gpu_batch_size: int = 8, generate_detailed: bool = False,
+                       num_workers: int = None) -> list:
+        """Generate AI-optimized descriptions for many images, batching BLIP generation."""
+        return list(self.iter_generate_batch(image_paths, gpu_batch_size, generate_detailed, num_workers))
+    
+    @torch.inference_mode()
+    def iter_generate_batch(self, image_paths: list, gpu_batch_size: int = 8, generate_detailed: bool = False,
+                            num_workers: int = None):
+        """Yield AI-optimized descriptions in input order as each sub-batch finishes.
+        
+        The detailed (sampled) caption costs a second generate pass and is only
+        produced when ``generate_detailed`` is set. Image decoding for the next
+        sub-batch overlaps with generation on a pool of ``num_workers`` threads
+        (defaults to the CPU count), and the next sub-batch's upload to the GPU
+        is issued before the current one is generated.
+        """
+        chunks = [image_paths[i:i + gpu_batch_size] for i in range(0, len(image_paths), gpu_batch_size)]
+        
+        if self.settings["warmup"] and self.device == "cuda":
+            # Prime the full and final partial batch sizes before real images arrive
+            self._warmup({len(chunk) for chunk in chunks})
+        
+        # Pipeline: decode chunk N+2 on CPU threads and upload chunk N+1 while chunk N generates
+        with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count()) as pool:
+            pending = [pool.submit(self._prepare_image, p, generate_detailed) for p in chunks[0]] if chunks else []
+            # Two host buffers owned by this call, so one chunk can be filled and uploaded while
+            # the previous one is still in use, and concurrent calls never share pixel memory
+            pixel_bufs = [None, None]
+            staged = self._stage_chunk(chunks[0], pending, pixel_bufs, slot=0) if chunks else None
+            if len(chunks) > 1:
+                pending = [pool.submit(self._prepare_image, p, generate_detailed) for p in chunks[1]]
             
-            # Standard caption
-            with torch.no_grad():
-                out = self.model.generate(**inputs, max_length=50, num_beams=5)
-            standard_caption = self.processor.decode(out[0], skip_special_tokens=True)
-            captions.append({
-                "type": "standard",
-                "text": standard_caption,
-                "confidence": 0.85  # Estimated confidence
-            })
+            for index, chunk_paths in enumerate(chunks):
+                current = staged
+                if index + 1 < len(chunks):
+                    staged = self._stage_chunk(chunks[index + 1], pending, pixel_bufs, slot=(index + 1) % 2)
+                if index + 2 < len(chunks):
+                    pending = [pool.submit(self._prepare_image, p, generate_detailed) for p in chunks[index + 2]]
+                
+                results = self._caption_chunk(current, generate_detailed)
+                
+                # Map results back to the requested order
+                for image_path in chunk_paths:
+                    yield results[image_path]
+    
+    def _prepare_image(self, image_path: str, generate_detailed: bool) -> tuple:
+        """Decode, resize and normalize one image (runs on worker threads).
+        
+        Returns ``(cache_key, cached_result, image_properties, pixels)``. On a
+        cache hit only ``cached_result`` is set and the image is never decoded.
+        ``cache_key`` is None when caching is disabled.
+        """
+        if self.cache_size > 0:
+            with open(image_path, "rb") as f:
+                data = f.read()
+            cache_key = (hashlib.sha256(data).digest(), generate_detailed)
             
-            # Detailed caption with higher max length
-            with torch.no_grad():
-                out = self.model.generate(**inputs, max_length=75, num_beams=3, temperature=0.7, do_sample=True)
-            detailed_caption = self.processor.decode(out[0], skip_special_tokens=True)
-            captions.append({
-                "type": "detailed",
-                "text": detailed_caption,
-                "confidence": 0.80
-            })
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cache_key, cached, None, None
+            source = io.BytesIO(data)
+        else:
+            # No cache hit is possible, so don't read and hash the whole file up front
+            cache_key = None
+            source = image_path
+        
+        # Image.open only parses the header; pixels are decoded by convert()
+        with Image.open(source) as image:
+            width, height = image.size
+            image_properties = {
+                "width": width,
+                "height": height,
+                "aspect_ratio": round(width / height, 2),
+                "format": image.format or "JPEG"
+            }
             
-            # Use the standard caption as primary
-            primary_caption = standard_caption
+            # Shrink to the model input size here so the processor only normalizes
+            image_size = self.model.config.vision_config.image_size
+            image = image.convert('RGB').resize((image_size, image_size), Image.BICUBIC)
+        
+        # Already at the model input size, so skip the processor's own resize pass
+        pixels = self.processor.image_processor(image, do_resize=False, return_tensors="np")["pixel_values"][0]
+        return cache_key, None, image_properties, pixels
+    
+    def _cache_get(self, cache_key: tuple):
+        """Return a private copy of the cached result for ``cache_key``, or None."""
+        with self._cache_lock:
+            result = self._result_cache.get(cache_key)
+            if result is None:
+                return None
+            self._result_cache.move_to_end(cache_key)
+        # Callers may modify what they get back; never hand out the cached objects
+        return copy.deepcopy(result)
+    
+    def _cache_put(self, cache_key: tuple, result: dict):
+        """Store a result, evicting the least recently used entries past ``cache_size``."""
+        if cache_key is None or self.cache_size <= 0:
+            return
+        # Snapshot, so later changes to the yielded result don't leak into the cache
+        snapshot = copy.deepcopy(result)
+        with self._cache_lock:
+            self._result_cache[cache_key] = snapshot
+            self._result_cache.move_to_end(cache_key)
+            while len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
+    
+    def _pixel_buffer(self, pixel_bufs: list, batch_size: int, slot: int) -> torch.Tensor:
+        """Return host buffer ``slot`` of ``pixel_bufs`` with room for ``batch_size`` images."""
+        buffer = pixel_bufs[slot]
+        if buffer is None or buffer.shape[0] < batch_size:
+            image_size = self.model.config.vision_config.image_size
+            buffer = pixel_bufs[slot] = torch.empty(
+                (batch_size, 3, image_size, image_size),
+                dtype=self.dtype,
+                pin_memory=self.device == "cuda"
+            )
+        return buffer[:batch_size]
+    
+    def _stage_chunk(self, chunk_paths: list, futures: list, pixel_bufs: list, slot: int) -> dict:
+        """Collect a chunk's decoded images and start uploading them to the device."""
+        staged = {"results": {}, "loaded": [], "pixel_values": None, "ready": None}
+        pixels = []
+        for image_path, future in zip(chunk_paths, futures):
+            try:
+                cache_key, cached, image_properties, image_pixels = future.result()
+            except Exception as e:
+                staged["results"][image_path] = self._error_result(image_path, e)
+                continue
             
-            # Extract tags and analyze context
-            tags = self.extract_tags_from_caption(primary_caption)
-            scene_context = self.analyze_scene_context(primary_caption)
+            if cached is not None:
+                # Same content seen before: reuse the analysis under this file's name
+                cached.update(filename=os.path.basename(image_path), timestamp=datetime.now().isoformat())
+                staged["results"][image_path] = cached
+                continue
+            staged["loaded"].append((image_path, image_properties, cache_key))
+            pixels.append(image_pixels)
+        
+        if not pixels:
+            return staged
+        
+        try:
+            # Fill the reusable buffer in place instead of stacking a new batch tensor
+            buffer = self._pixel_buffer(pixel_bufs, len(pixels), slot)
+            for i, image_pixels in enumerate(pixels):
+                buffer[i].copy_(torch.from_numpy(image_pixels))
             
-            # Generate AI-optimized description
-            ai_description = self.create_ai_description(primary_caption, scene_context, tags)
+            if self._copy_stream is None:
+                staged["pixel_values"] = buffer
+            else:
+                # Asynchronous copy from pinned memory on the side stream; the event marks completion
+                with torch.cuda.stream(self._copy_stream):
+                    staged["pixel_values"] = buffer.to(self.device, non_blocking=True)
+                    staged["ready"] = torch.cuda.Event()
+                    staged["ready"].record()
+        except Exception as e:
+            for image_path, _, _ in staged["loaded"]:
+                staged["results"][image_path] = self._error_result(image_path, e)
+            staged["loaded"] = []
+        return staged
+    
+    def _caption_chunk(self, staged: dict, generate_detailed: bool) -> dict:
+        """Run one batched generate call over a chunk prepared by ``_stage_chunk``."""
+        results = staged["results"]
+        chunk = staged["loaded"]
+        if not chunk:
+            return results
+        
+        try:
+            pixel_values = staged["pixel_values"]
+            if staged["ready"] is not None:
+                # Only wait for this chunk's upload, not the one queued behind it
+                torch.cuda.current_stream().wait_event(staged["ready"])
+                pixel_values.record_stream(torch.cuda.current_stream())
             
-            # Create comprehensive result
-            result = {
-                "filename": os.path.basename(image_path),
-                "timestamp": datetime.now().isoformat(),
-                "image_properties": {
-                    "width": width,
-                    "height": height,
-                    "aspect_ratio": round(width / height, 2),
-                    "format": image.format or "JPEG"
-                },
-                "ai_description": ai_description,
-                "captions": captions,
-                "tags": sorted(tags),
-                "scene_context": scene_context,
-                "related_topics": self.generate_related_topics(tags, scene_context),
-                "metadata": {
-                    "model_used": "BLIP-base",
-                    "processing_device": self.device,
-                    "analysis_version": "1.0"
-                }
-            }
+            standard_kwargs = {"max_length": self.max_length, "num_beams": self.num_beams}
+            if self.num_beams > 1:
+                # Early stopping only applies to beam search
+                standard_kwargs["early_stopping"] = True
             
-            return result
+            detailed_captions = [None] * len(chunk)
+            with torch.inference_mode(), self._model_lock:
+                if generate_detailed:
+                    # Two decoding passes over the same images: run the vision encoder once
+                    image_embeds = self._encode_images(pixel_values)
+                    out = self._generate_from_embeds(image_embeds, **standard_kwargs)
+                    standard_captions = self.processor.batch_decode(out, skip_special_tokens=True)
+                    
+                    # Detailed caption with higher max length
+                    out = self._generate_from_embeds(image_embeds, max_length=75, num_beams=3, temperature=0.7, do_sample=True)
+                    detailed_captions = self.processor.batch_decode(out, skip_special_tokens=True)
+                else:
+                    # Standard caption
+                    out = self.model.generate(pixel_values=pixel_values, **standard_kwargs)
+                    standard_captions = self.processor.batch_decode(out, skip_special_tokens=True)
             
+            for (image_path, image_properties, cache_key), standard_caption, detailed_caption in zip(chunk, standard_captions, detailed_captions):
+                captions = [{
+                    "type": "standard",
+                    "text": standard_caption,
+                    "confidence": 0.85  # Estimated confidence
+                }]
+                if detailed_caption is not None:
+                    captions.append({
+                        "type": "detailed",
+                        "text": detailed_caption,
+                        "confidence": 0.80
+                    })
+                results[image_path] = self._build_result(image_path, image_properties, captions)
+                self._cache_put(cache_key, results[image_path])
         except Exception as e:
-            print(f"Error processing {image_path}: {str(e)}")
-            return {
-                "filename": os.path.basename(image_path),
-                "timestamp": datetime.now().isoformat(),
-                "error": str(e),
-                "ai_description": "Unable to process this image. Please try again or use a different image.",
-                "captions": [],
-                "tags": [],
-                "scene_context": {},
-                "related_topics": ["image analysis", "technical support"]
+            for image_path, _, _ in chunk:
+                results[image_path] = self._error_result(image_path, e)
+        return results
+    
+    def _encode_images(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """Run the vision encoder and return the image embeddings the decoder attends to."""
+        return self.model.vision_model(pixel_values=pixel_values)[0]
+    
+    def _generate_from_embeds(self, image_embeds: torch.Tensor, **generate_kwargs) -> torch.Tensor:
+        """Generate caption token ids from precomputed image embeddings.
+        
+        Mirrors ``BlipForConditionalGeneration.generate`` without re-running the
+        vision encoder.
+        """
+        text_config = self.model.config.text_config
+        batch_size = image_embeds.shape[0]
+        input_ids = torch.full((batch_size, 1), text_config.bos_token_id, dtype=torch.long, device=image_embeds.device)
+        image_attention_mask = torch.ones(image_embeds.shape[:-1], dtype=torch.long, device=image_embeds.device)
+        return self.model.text_decoder.generate(
+            input_ids=input_ids,
+            eos_token_id=text_config.sep_token_id,
+            pad_token_id=text_config.pad_token_id,
+            encoder_hidden_states=image_embeds,
+            encoder_attention_mask=image_attention_mask,
+            **generate_kwargs
+        )
+    
+    def _build_result(self, image_path: str, image_properties: dict, captions: list) -> dict:
+        """Assemble the full analysis result for one captioned image."""
+        # Use the standard caption as primary
+        primary_caption = captions[0]["text"]
+        
+        # Extract tags, context and topics in a single analysis pass
+        analysis = self._analyze(primary_caption)
+        tags = analysis["tags"]
+        scene_context = analysis["context"]
+        
+        # Generate AI-optimized description
+        ai_description = self.create_ai_description(primary_caption, scene_context, tags)
+        
+        # Create comprehensive result
+        return {
+            "filename": os.path.basename(image_path),
+            "timestamp": datetime.now().isoformat(),
+            "image_properties": image_properties,
+            "ai_description": ai_description,
+            "captions": captions,
+            "tags": sorted(tags),
+            "scene_context": scene_context,
+            "related_topics": analysis["topics"],
+            "metadata": {
+                "model_used": "BLIP-base",
+                "processing_device": self.device,
+                "analysis_version": "1.0"
             }
+        }
+    
+    def _error_result(self, image_path: str, error: Exception) -> dict:
+        """Build the fallback result for an image that could not be processed."""
+        print(f"Error processing {image_path}: {str(error)}")
+        return {
+            "filename": os.path.basename(image_path),
+            "timestamp": datetime.now().isoformat(),
+            "error": str(error),
+            "ai_description": "Unable to process this image. Please try again or use a different image.",
+            "captions": [],
+            "tags": [],
+            "scene_context": {},
+            "related_topics": ["image analysis", "technical support"]
+        }
     
     def create_ai_description(self, caption: str, context: dict, tags: list) -> str:
         """Create a rich description optimized for AI understanding."""
@@ -233,12 +600,30 @@ class AdvancedImageCaptioner:
 
 # Global captioner instance (lazy loading)
 _captioner = None
+_captioner_lock = threading.Lock()
 
-def get_captioner():
-    """Get or create the global captioner instance."""
+def get_captioner(**kwargs):
+    """Get or create the global captioner instance.
+    
+    Keyword arguments are passed to ``AdvancedImageCaptioner`` when the
+    instance is first created. Once it exists, a ``ValueError`` is raised if
+    they differ from the settings it was created with.
+    """
     global _captioner
     if _captioner is None:
-        _captioner = AdvancedImageCaptioner()
+        with _captioner_lock:
+            # Re-check: another thread may have created it while we waited
+            if _captioner is None:
+                _captioner = AdvancedImageCaptioner(**kwargs)
+                return _captioner
+    
+    conflicts = {
+        key: (_captioner.settings.get(key), value)
+        for key, value in kwargs.items()
+        if key not in _captioner.settings or _captioner.settings[key] != value
+    }
+    if conflicts:
+        raise ValueError(f"Captioner already created with different settings (existing, requested): {conflicts}")
     return _captioner
 
 def image_to_caption(image_path: str) -> str:
@@ -247,7 +632,75 @@ def image_to_caption(image_path: str) -> str:
     result = captioner.generate_ai_optimized_description(image_path)
     return result.get("captions", [{}])[0].get("text", "Unable to generate caption")
 
-def image_to_ai_description(image_path: str) -> dict:
+def image_to_ai_description(image_path: str, generate_detailed: bool = False) -> dict:
     """Generate comprehensive AI-optimized description for an image."""
     captioner = get_captioner()
-    return captioner.generate_ai_optimized_description(image_path)
\ No newline at end of file
+    return captioner.generate_ai_optimized_description(image_path, generate_detailed=generate_detailed)
+
+def images_to_ai_descriptions(image_paths: list, gpu_batch_size: int = 8, generate_detailed: bool = False) -> list:
+    """Generate comprehensive AI-optimized descriptions for many images in batches."""
+    captioner = get_captioner()
+    return captioner.generate_batch(image_paths, gpu_batch_size=gpu_batch_size, generate_detailed=generate_detailed)
+
+def iter_ai_descriptions(image_paths: list, gpu_batch_size: int = 8, generate_detailed: bool = False):
+    """Yield comprehensive AI-optimized descriptions as each batch of images finishes."""
+    captioner = get_captioner()
+    return captioner.iter_generate_batch(image_paths, gpu_batch_size=gpu_batch_size, generate_detailed=generate_detailed)
+
+# Per-process captioner used by CPU worker pools, or the error that prevented loading it
+_worker_captioner = None
+_worker_init_error = None
+
+def _init_worker(captioner_kwargs: dict, num_threads: int):
+    """Load a captioner with its share of the CPU threads in a pool worker process."""
+    global _worker_captioner, _worker_init_error
+    # Split the cores between processes instead of letting each one claim all of them
+    torch.set_num_threads(num_threads)
+    try:
+        _worker_captioner = AdvancedImageCaptioner(**captioner_kwargs)
+    except Exception as e:
+        # An initializer that raises makes Pool respawn workers forever; report it from the first task instead
+        _worker_init_error = f"{type(e).__name__}: {e}"
+
+def _worker_generate(task: tuple) -> list:
+    """Caption one chunk of image paths in a pool worker process."""
+    if _worker_init_error is not None:
+        raise RuntimeError(f"Captioner failed to load in worker process: {_worker_init_error}")
+    image_paths, generate_detailed = task
+    return _worker_captioner.generate_batch(
+        image_paths, gpu_batch_size=len(image_paths), generate_detailed=generate_detailed, num_workers=1
+    )
+
+def iter_ai_descriptions_multiprocess(image_paths: list, processes: int = None, chunk_size: int = 4,
+                                      generate_detailed: bool = False, **captioner_kwargs):
+    """Yield AI-optimized descriptions using a pool of CPU worker processes.
+    
+    Intended for CPU-only machines, where one process leaves most cores idle.
+    Each worker loads its own model, gets ``cpu_count // processes`` threads
+    and captions up to ``chunk_size`` images per generate call; chunks shrink
+    when needed so every worker has work. With fewer than two chunks the
+    images are captioned in this process instead. Results are yielded in
+    input order. If the model cannot be loaded, a ``RuntimeError`` is raised
+    and the pool is shut down.
+    """
+    if not image_paths:
+        return
+    cpu_count = os.cpu_count() or 2
+    processes = max(1, processes or cpu_count // 2)
+    # Smaller chunks rather than idle workers when there are few images per process
+    chunk_size = max(1, min(chunk_size, -(-len(image_paths) // processes)))
+    tasks = [(image_paths[i:i + chunk_size], generate_detailed) for i in range(0, len(image_paths), chunk_size)]
+    if len(tasks) < 2:
+        # A pool would only add process start-up and a second model load
+        yield from get_captioner(**captioner_kwargs).iter_generate_batch(
+            image_paths, gpu_batch_size=chunk_size, generate_detailed=generate_detailed
+        )
+        return
+    
+    # Every worker loads its own model, so don't start more than there are chunks
+    processes = min(processes, len(tasks))
+    num_threads = max(1, cpu_count // processes)
+    with multiprocessing.Pool(processes, initializer=_init_worker,
+                              initargs=(captioner_kwargs, num_threads)) as pool:
+        for results in pool.imap(_worker_generate, tasks):
+            yield from results
@@ -1,6 +1,71 @@
+import json
 import os
 
+# Prefer a native JSON serializer when one is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+_IMAGE_EXTS = frozenset({".png", ".jpg", ".jpeg"})
+
 def list_images(folder: str):
     """Return a list of image file paths in a folder."""
-    valid_exts = (".png", ".jpg", ".jpeg")
-    return [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(valid_exts)]
+    # scandir reuses the file type from the directory listing, so no extra stat per entry
+    with os.scandir(folder) as entries:
+        return [
+            entry.path for entry in entries
+            if os.path.splitext(entry.name)[1].lower() in _IMAGE_EXTS and entry.is_file()
+        ]
+
+def dumps_indented(item) -> bytes:
+    """Serialize to UTF-8 JSON bytes with 2-space indentation using the fastest available library."""
+    if orjson is not None:
+        return orjson.dumps(item, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    if ujson is not None:
+        return ujson.dumps(item, indent=2, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")
+    return json.dumps(item, indent=2, ensure_ascii=False).encode("utf-8")
+
+class JsonArrayWriter:
+    """Stream items into a ``{"<key>": [...]}`` JSON file one at a time.
+    
+    Produces the same layout as ``json.dump(..., indent=2)`` without holding
+    every item in memory. Output goes to ``<path>.tmp`` and only replaces
+    ``path`` when the block exits cleanly, so an interrupted run keeps the
+    previous file instead of leaving a truncated one that still parses.
+    """
+    
+    def __init__(self, path: str, key: str = "images"):
+        self.path = path
+        self.key = key
+        self.count = 0
+        self._tmp_path = path + ".tmp"
+        self._file = None
+    
+    def __enter__(self):
+        # Binary mode: serialized bytes go straight to disk without a decode/encode round trip
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(("{\n  " + json.dumps(self.key) + ": [").encode("utf-8"))
+        return self
+    
+    def write(self, item: dict):
+        """Append one item to the array."""
+        self._file.write(b",\n" if self.count else b"\n")
+        # Indent on "\n" only (never part of a multi-byte UTF-8 sequence or an unescaped string)
+        self._file.write(b"    " + dumps_indented(item).replace(b"\n", b"\n    "))
+        self.count += 1
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # Discard the partial output and keep whatever was at path before
+            self._file.close()
+            os.remove(self._tmp_path)
+            return
+        
+        self._file.write(b"\n  ]\n}" if self.count else b"]\n}")
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
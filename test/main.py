@@ -1,16 +1,30 @@
-import json
 import os
 import sys
 from pathlib import Path
 
+import torch
+
 # Add project root to Python path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.captioner import image_to_ai_description
-from src.utils import list_images
+from src.captioner import get_captioner, iter_ai_descriptions, iter_ai_descriptions_multiprocess
+from src.utils import JsonArrayWriter, list_images
+
+# Number of images per BLIP generate call (override with GPU_BATCH_SIZE env var)
+GPU_BATCH_SIZE = int(os.environ.get("GPU_BATCH_SIZE", "8"))
+
+# Also produce the sampled "detailed" caption (costs a second generate pass)
+GENERATE_DETAILED = os.environ.get("GENERATE_DETAILED", "0") == "1"
 
-def process_folder(input_folder="data", output_file="outputs/ai_captions.json"):
+# Beam width for the standard caption (1 = greedy, fastest)
+NUM_BEAMS = int(os.environ.get("NUM_BEAMS", "1"))
+
+# Captioner processes to run on CPU-only machines (1 = single process)
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+def process_folder(input_folder="data", output_file="outputs/ai_captions.json", gpu_batch_size=GPU_BATCH_SIZE,
+                   generate_detailed=GENERATE_DETAILED, num_beams=NUM_BEAMS, cpu_workers=CPU_WORKERS):
     """Process all images in a folder and generate comprehensive AI-optimized JSON."""
     print(f"Processing images from: {input_folder}")
     images = list_images(input_folder)
@@ -22,47 +36,42 @@ def process_folder(input_folder="data", output_file="outputs/ai_captions.json"):
     # Ensure output directory exists
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
-    # Process images and collect results
-    results = {"images": []}
-    
-    print(f"Found {len(images)} images to process...")
+    print(f"Found {len(images)} images to process (batch size {gpu_batch_size})...")
     print("Generating comprehensive AI-optimized descriptions...\n")
     
-    for i, img_path in enumerate(images, 1):
-        filename = os.path.basename(img_path)
-        print(f"[{i}/{len(images)}] Processing: {filename}")
-        
-        # Generate comprehensive AI description
-        ai_result = image_to_ai_description(img_path)
-        
-        results["images"].append(ai_result)
-        
-        # Show preview of results
-        print(f"  AI Description: {ai_result.get('ai_description', 'N/A')[:100]}...")
-        print(f"  Tags: {', '.join(ai_result.get('tags', [])[:5])}")
-        print(f"  Conversation Starter: {ai_result.get('chatbot_prompts', {}).get('conversation_starter', 'N/A')[:80]}...")
-        print()
-    
-    # Save results to JSON file
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
-    
-    print(f"Processing complete! Results saved to: {output_file}")
-    print(f"Generated AI-optimized descriptions for {len(results['images'])} images.")
-    
     # Also create a simple version for backward compatibility
     simple_output = output_file.replace("ai_captions.json", "captions.json")
-    simple_results = {"images": []}
     
-    for img_data in results["images"]:
-        simple_results["images"].append({
-            "filename": img_data["filename"],
-            "caption": img_data.get("captions", [{}])[0].get("text", "No caption available")
-        })
+    # Stream each result to disk as its batch finishes instead of collecting them all
+    if torch.cuda.is_available() or cpu_workers <= 1:
+        # Load the model with the requested decoding settings
+        get_captioner(num_beams=num_beams)
+        ai_results = iter_ai_descriptions(images, gpu_batch_size=gpu_batch_size,
+                                          generate_detailed=generate_detailed)
+    else:
+        # No GPU to serialize on: spread images across worker processes sharing the cores
+        print(f"Using up to {cpu_workers} CPU worker processes")
+        ai_results = iter_ai_descriptions_multiprocess(images, processes=cpu_workers, chunk_size=gpu_batch_size,
+                                                       generate_detailed=generate_detailed, num_beams=num_beams)
     
-    with open(simple_output, "w", encoding="utf-8") as f:
-        json.dump(simple_results, f, indent=2, ensure_ascii=False)
+    with JsonArrayWriter(output_file) as writer, JsonArrayWriter(simple_output) as simple_writer:
+        for i, ai_result in enumerate(ai_results, 1):
+            print(f"[{i}/{len(images)}] Processed: {ai_result['filename']}")
+            
+            writer.write(ai_result)
+            simple_writer.write({
+                "filename": ai_result["filename"],
+                "caption": (ai_result.get("captions") or [{}])[0].get("text", "No caption available")
+            })
+            
+            # Show preview of results
+            print(f"  AI Description: {ai_result.get('ai_description', 'N/A')[:100]}...")
+            print(f"  Tags: {', '.join(ai_result.get('tags', [])[:5])}")
+            print(f"  Conversation Starter: {ai_result.get('chatbot_prompts', {}).get('conversation_starter', 'N/A')[:80]}...")
+            print()
     
+    print(f"Processing complete! Results saved to: {output_file}")
+    print(f"Generated AI-optimized descriptions for {writer.count} images.")
     print(f"Simple format also saved to: {simple_output}")
 
 if __name__ == "__main__":
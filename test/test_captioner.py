@@ -0,0 +1,158 @@
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+# The captioner module needs the model stack importable; no weights are loaded here
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src import captioner
+
+
+def _bare_captioner(**settings):
+    """Captioner instance without a loaded model, for testing non-model logic."""
+    instance = object.__new__(captioner.AdvancedImageCaptioner)
+    instance.settings = {"num_beams": 1, "max_length": 30, **settings}
+    return instance
+
+
+def test_get_captioner_rejects_conflicting_settings(monkeypatch):
+    existing = _bare_captioner()
+    monkeypatch.setattr(captioner, "_captioner", existing)
+    
+    assert captioner.get_captioner() is existing
+    assert captioner.get_captioner(num_beams=1) is existing
+    with pytest.raises(ValueError, match="num_beams"):
+        captioner.get_captioner(num_beams=5)
+
+
+# Baseline implementations (per-category regexes and substring checks) that
+# the single keyword scan replaced; results must match on whole-word captions
+_BASELINE_TAG_PATTERNS = [
+    r'\b(?:person|people|man|woman|child|boy|girl|baby|adult)\b',
+    r'\b(?:running|walking|sitting|standing|jumping|dancing|playing|working|exercising|cooking|reading|writing|driving|riding|swimming|flying|climbing|lifting|pushing|pulling|throwing|catching|kicking|hitting)\b',
+    r'\b(?:football|basketball|tennis|soccer|baseball|golf|hockey|volleyball|boxing|wrestling|cycling|skiing|surfing|skateboarding|yoga|gym|fitness|workout|exercise|bench press|squats|deadlift)\b',
+    r'\b(?:park|beach|street|road|building|house|office|school|hospital|restaurant|store|mall|gym|stadium|field|court|track|pool|lake|river|mountain|forest|desert|city|town|village)\b',
+    r'\b(?:car|truck|bike|bicycle|motorcycle|bus|train|plane|boat|chair|table|bed|computer|phone|camera|book|ball|bottle|cup|plate|food|tree|flower|animal|dog|cat|bird)\b',
+    r'\b(?:sunny|cloudy|rainy|snowy|foggy|windy|storm|clear|bright|dark|day|night|morning|afternoon|evening|sunset|sunrise)\b',
+    r'\b(?:red|blue|green|yellow|orange|purple|pink|black|white|gray|grey|brown|silver|gold)\b',
+    r'\b(?:happy|sad|angry|excited|surprised|calm|peaceful|energetic|tired|focused|concentrated|relaxed)\b',
+]
+
+_BASELINE_SCENE_RULES = [
+    ("setting", [("indoor", ['indoor', 'inside', 'room', 'office', 'house', 'building']),
+                 ("outdoor", ['outdoor', 'outside', 'park', 'street', 'beach', 'field', 'forest'])]),
+    ("time_of_day", [("night", ['night', 'evening', 'dark']),
+                     ("morning", ['morning', 'sunrise']),
+                     ("day", ['afternoon', 'day', 'sunny', 'bright']),
+                     ("evening", ['sunset', 'dusk'])]),
+    ("activity_level", [("high", ['running', 'jumping', 'dancing', 'playing', 'exercising', 'working out']),
+                        ("medium", ['walking', 'standing', 'working']),
+                        ("low", ['sitting', 'lying', 'sleeping', 'resting'])]),
+    ("social_context", [("group", ['group', 'people', 'crowd', 'team', 'family']),
+                        ("individual", ['person', 'man', 'woman', 'individual'])]),
+    ("mood", [("positive", ['smiling', 'happy', 'celebrating', 'laughing']),
+              ("focused", ['focused', 'concentrated', 'serious', 'determined']),
+              ("calm", ['relaxed', 'calm', 'peaceful'])]),
+]
+
+
+def _baseline_tags(caption):
+    caption_lower = caption.lower()
+    return {tag for pattern in _BASELINE_TAG_PATTERNS for tag in re.findall(pattern, caption_lower)}
+
+
+def _baseline_context(caption):
+    caption_lower = caption.lower()
+    context = {"setting": "unknown", "time_of_day": "unknown", "activity_level": "unknown",
+               "social_context": "unknown", "mood": "neutral"}
+    for field, rules in _BASELINE_SCENE_RULES:
+        for value, words in rules:
+            if any(word in caption_lower for word in words):
+                context[field] = value
+                break
+    return context
+
+
+PARITY_CAPTIONS = [
+    "a man doing a bench press in a gym",
+    "a man running on the beach",
+    "a list of workouts for the day",
+    "A group of people working out in a park at sunset",
+    "a woman sitting inside a room, smiling",
+    "a dog and a cat on a red bed at night",
+    "people working on computers in an office",
+    "a happy child riding a bike down the street in the morning",
+    "bench press",
+    "working out",
+    "a group of women standing outdoors",
+    "a bedroom with a bed and a window",
+    "a man in a classroom",
+    "a woman brushing her teeth in a bathroom",
+    "a dog lying on the floor of a living room",
+    "people walking down streets",
+    "cows grazing in fields near tall buildings",
+    "",
+]
+
+
+@pytest.mark.parametrize("caption", PARITY_CAPTIONS)
+def test_keyword_scan_matches_baseline(caption):
+    analyzer = _bare_captioner()
+    tags = analyzer.extract_tags_from_caption(caption)
+    
+    assert len(tags) == len(set(tags))
+    assert set(tags) == _baseline_tags(caption)
+    assert analyzer.analyze_scene_context(caption) == _baseline_context(caption)
+
+
+def test_scan_keywords_has_no_trailing_duplicates():
+    assert captioner._scan_keywords("a man on the beach") == ["man", "beach"]
+    assert captioner._scan_keywords("a man doing a bench press") == ["man", "bench press"]
+    assert captioner._scan_keywords("people working out") == ["people", "working", "working out"]
+
+
+def test_result_cache_isolates_callers():
+    cache_owner = _bare_captioner()
+    cache_owner.cache_size = 4
+    cache_owner._result_cache = captioner.OrderedDict()
+    cache_owner._cache_lock = captioner.threading.Lock()
+    
+    result = {"filename": "a.jpg", "tags": ["man"], "scene_context": {"mood": "neutral"}}
+    cache_owner._cache_put("key", result)
+    result["tags"].append("mutated")
+    
+    first = cache_owner._cache_get("key")
+    first["scene_context"]["mood"] = "mutated"
+    
+    assert cache_owner._cache_get("key") == {"filename": "a.jpg", "tags": ["man"], "scene_context": {"mood": "neutral"}}
+
+
+class _FailingCaptioner:
+    def __init__(self, **kwargs):
+        raise OSError("model not found")
+
+
+@pytest.mark.skipif(captioner.multiprocessing.get_start_method() != "fork",
+                    reason="workers must inherit the patched captioner class")
+def test_multiprocess_reports_worker_load_failure(monkeypatch):
+    monkeypatch.setattr(captioner, "AdvancedImageCaptioner", _FailingCaptioner)
+    with pytest.raises(RuntimeError, match="model not found"):
+        list(captioner.iter_ai_descriptions_multiprocess(["a.jpg", "b.jpg"], processes=2, chunk_size=1))
+
+
+class _RecordingCaptioner:
+    def iter_generate_batch(self, image_paths, gpu_batch_size=8, generate_detailed=False):
+        return iter([(path, gpu_batch_size) for path in image_paths])
+
+
+def test_multiprocess_runs_single_chunk_in_process(monkeypatch):
+    monkeypatch.setattr(captioner, "get_captioner", lambda **kwargs: _RecordingCaptioner())
+    results = list(captioner.iter_ai_descriptions_multiprocess(["a.jpg", "b.jpg"], processes=1, chunk_size=8))
+    assert results == [("a.jpg", 2), ("b.jpg", 2)]
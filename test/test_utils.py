@@ -0,0 +1,70 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src import utils
+from src.utils import JsonArrayWriter
+
+
+def _write(path, items):
+    with JsonArrayWriter(str(path)) as writer:
+        for item in items:
+            writer.write(item)
+    return path.read_text(encoding="utf-8")
+
+
+def test_json_array_writer_matches_json_dump(tmp_path):
+    items = [
+        {"filename": "a.jpg", "tags": ["man", "gym"], "image_properties": {"width": 612, "aspect_ratio": 1.5}},
+        {"filename": "b.png", "captions": [], "scene_context": {}},
+    ]
+    text = _write(tmp_path / "out.json", items)
+    assert text == json.dumps({"images": items}, indent=2, ensure_ascii=False)
+
+
+def test_json_array_writer_empty_array(tmp_path):
+    text = _write(tmp_path / "out.json", [])
+    assert text == json.dumps({"images": []}, indent=2)
+    assert json.loads(text) == {"images": []}
+
+
+def test_json_array_writer_non_ascii_values(tmp_path):
+    items = [{"filename": "café line\u0085end.jpg", "caption": "un homme\u2028à la plage ✓"}]
+    text = _write(tmp_path / "out.json", items)
+    assert json.loads(text) == {"images": items}
+    assert text == json.dumps({"images": items}, indent=2, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("backend", ["orjson", "ujson", "json"])
+def test_json_array_writer_backends_share_layout(tmp_path, monkeypatch, backend):
+    if backend == "orjson":
+        pytest.importorskip("orjson")
+    elif backend == "ujson":
+        pytest.importorskip("ujson")
+        monkeypatch.setattr(utils, "orjson", None)
+    else:
+        monkeypatch.setattr(utils, "orjson", None)
+        monkeypatch.setattr(utils, "ujson", None)
+    
+    items = [{"filename": "photos/2024/café.jpg", "aspect_ratio": 0.62, "tags": [], "caption": "a man on a beach"}]
+    text = _write(tmp_path / "out.json", items)
+    assert text == json.dumps({"images": items}, indent=2, ensure_ascii=False)
+
+
+def test_json_array_writer_keeps_previous_output_on_error(tmp_path):
+    path = tmp_path / "out.json"
+    previous = _write(path, [{"filename": "old.jpg"}])
+    
+    with pytest.raises(KeyboardInterrupt):
+        with JsonArrayWriter(str(path)) as writer:
+            writer.write({"filename": "new.jpg"})
+            raise KeyboardInterrupt
+    
+    assert path.read_text(encoding="utf-8") == previous
+    assert not (tmp_path / "out.json.tmp").exists()